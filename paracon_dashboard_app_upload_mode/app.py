@@ -2,12 +2,20 @@
 import os
 import io
 import time
+import hashlib
 import pandas as pd
 import numpy as np
+import openpyxl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
 import plotly.express as px
 import streamlit as st
 from dotenv import load_dotenv
 
+# Copy-on-Write: slices and shallow copies are safe views, copied lazily only if written to
+pd.set_option("mode.copy_on_write", True)
+
 st.set_page_config(page_title="Paracon Revenue Dashboards", layout="wide")
 
 # -------- Optional password gate --------
@@ -44,17 +52,86 @@ load_dotenv()
 RA_DATA_PATH = os.getenv("RA_DATA_PATH", "")
 FORECAST_PATH = os.getenv("FORECAST_PATH", "")
 
-@st.cache_data(show_spinner=False)
-def read_xlsx_filelike(file, sheet, usecols=None):
-    df = pd.read_excel(file, sheet_name=sheet, engine="openpyxl", dtype_backend="pyarrow", usecols=usecols)
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", "512")) * 2**20
+CACHE_MAX_AGE = float(os.getenv("CACHE_MAX_AGE_DAYS", "7")) * 86400
+
+# Rust-backed calamine parses xlsx much faster than openpyxl; fall back if it isn't installed.
+try:
+    import python_calamine  # noqa: F401
+    XLSX_ENGINE = "calamine"
+except ImportError:
+    XLSX_ENGINE = "openpyxl"
+
+# ---- Parsed-sheet cache: Feather files keyed by workbook hash ----
+def _feather_path(key, sheet, usecols):
+    if usecols:
+        key += "_" + hashlib.blake2b(repr(list(usecols)).encode(), digest_size=8).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}_{sheet}.feather")
+
+def _prune_cache():
+    """Drop cache files older than CACHE_MAX_AGE_DAYS, then least recently used ones beyond CACHE_MAX_MB."""
+    try:
+        entries = [(e.path, e.stat()) for e in os.scandir(CACHE_DIR) if e.is_file()]
+    except OSError:
+        return
+    now, total = time.time(), 0
+    for path, stat in sorted(entries, key=lambda e: e[1].st_mtime, reverse=True):
+        total += stat.st_size
+        if now - stat.st_mtime > CACHE_MAX_AGE or total > CACHE_MAX_BYTES:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def read_xlsx_cached(src, key, sheet, usecols=None):
+    path = _feather_path(key, sheet, usecols)
+    if os.path.exists(path):
+        # uncompressed IPC is memory-mapped: columns point into the OS page cache, shared by every worker
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        try:
+            os.utime(path)  # mtime doubles as last-used time for _prune_cache
+        except OSError:
+            pass
+        return df
+    # usecols holds stripped header names; match raw headers the same way
+    picker = (lambda c, wanted=frozenset(usecols): str(c).strip() in wanted) if usecols else None
+    df = pd.read_excel(src, sheet_name=sheet, engine=XLSX_ENGINE, dtype_backend="pyarrow", usecols=picker)
     df.columns = [str(c).strip() for c in df.columns]
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="uncompressed")
+        os.replace(tmp, path)
+    except (OSError, pa.ArrowException):
+        # cache is best-effort; mixed-type sheets may not convert to Arrow
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+    _prune_cache()
     return df
 
+# Both readers take the workbook's source_key as a hashed argument, so st.cache_data
+# misses as soon as an upload is replaced or a file on disk changes.
 @st.cache_data(show_spinner=False)
-def read_xlsx_path(path, sheet, usecols=None):
-    df = pd.read_excel(path, sheet_name=sheet, engine="openpyxl", dtype_backend="pyarrow", usecols=usecols)
-    df.columns = [str(c).strip() for c in df.columns]
-    return df
+def read_xlsx_filelike(_file, fingerprint, sheet, usecols=None):
+    data = _file.getvalue()
+    key = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return read_xlsx_cached(io.BytesIO(data), key, sheet, usecols)
+
+@st.cache_data(show_spinner=False)
+def read_xlsx_path(path, fingerprint, sheet, usecols=None):
+    key = hashlib.blake2b(repr(fingerprint).encode(), digest_size=16).hexdigest()
+    return read_xlsx_cached(path, key, sheet, usecols)
+
+def source_key(src):
+    """Cheap fingerprint of a workbook: (path, mtime, size) for paths, the upload id for uploads."""
+    if isinstance(src, str):
+        stat = os.stat(src)
+        return (os.path.abspath(src), stat.st_mtime_ns, stat.st_size)
+    return src.file_id
 
 # ---- Choose source method: paths or uploads ----
 st.subheader("Data sources")
@@ -66,17 +143,7 @@ if mode == "Upload files":
     if not up1 or not up2:
         st.info("Upload both files to proceed.")
         st.stop()
-    # detect sheets
-    x1 = pd.ExcelFile(up1)
-    x2 = pd.ExcelFile(up2)
-    s_source = next((s for s in x1.sheet_names if s.lower()=="source"), x1.sheet_names[0])
-    s_quarters = next((s for s in x1.sheet_names if s.lower() in ["quaters","quarters"]), x1.sheet_names[-1])
-    s_budget = next((s for s in x2.sheet_names if s.lower()=="budget details".lower()), x2.sheet_names[0])
-    s_forecast = next((s for s in x2.sheet_names if s.lower()=="forecast detail".lower()), x2.sheet_names[-1])
-    df_source = read_xlsx_filelike(up1, s_source)
-    df_quarters = read_xlsx_filelike(up1, s_quarters)
-    df_budget = read_xlsx_filelike(up2, s_budget)
-    df_forecast = read_xlsx_filelike(up2, s_forecast)
+    read_xlsx, src1, src2 = read_xlsx_filelike, up1, up2
 else:
     RA_DATA_PATH = st.text_input("Path to Revenue Analysis - Data Source.xlsx", RA_DATA_PATH)
     FORECAST_PATH = st.text_input("Path to FY2026 Contracting Forecast.xlsx", FORECAST_PATH)
@@ -86,61 +153,116 @@ else:
     if not (FORECAST_PATH and os.path.exists(FORECAST_PATH)):
         st.warning("Set a valid path for FY2026 Contracting Forecast.xlsx")
         st.stop()
-    x1 = pd.ExcelFile(RA_DATA_PATH)
-    x2 = pd.ExcelFile(FORECAST_PATH)
-    s_source = next((s for s in x1.sheet_names if s.lower()=="source"), x1.sheet_names[0])
-    s_quarters = next((s for s in x1.sheet_names if s.lower() in ["quaters","quarters"]), x1.sheet_names[-1])
-    s_budget = next((s for s in x2.sheet_names if s.lower()=="budget details".lower()), x2.sheet_names[0])
-    s_forecast = next((s for s in x2.sheet_names if s.lower()=="forecast detail".lower()), x2.sheet_names[-1])
-    df_source = read_xlsx_path(RA_DATA_PATH, s_source)
-    df_quarters = read_xlsx_path(RA_DATA_PATH, s_quarters)
-    df_budget = read_xlsx_path(FORECAST_PATH, s_budget)
-    df_forecast = read_xlsx_path(FORECAST_PATH, s_forecast)
-
-def find_col(df, candidates):
-    cols = {str(c).lower(): c for c in df.columns}
+    read_xlsx, src1, src2 = read_xlsx_path, RA_DATA_PATH, FORECAST_PATH
+
+def find_col(columns, candidates):
+    cols = {str(c).lower(): c for c in columns}
     for cand in candidates:
         if cand.lower() in cols:
             return cols[cand.lower()]
     return None
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def workbook_headers(_src, fingerprint):
+    """Stripped header row of every sheet, in workbook order.
+
+    openpyxl's read-only mode streams rows lazily, so only the first row of each sheet is parsed.
+    """
+    wb = openpyxl.load_workbook(_src if isinstance(_src, str) else io.BytesIO(_src.getvalue()),
+                                read_only=True, data_only=True)
+    try:
+        return {ws.title: [str(c).strip() for c in next(ws.iter_rows(max_row=1, values_only=True), ())]
+                for ws in wb.worksheets}
+    finally:
+        wb.close()
+
+# detect sheets
+h1 = workbook_headers(src1, source_key(src1))
+h2 = workbook_headers(src2, source_key(src2))
+s_source = next((s for s in h1 if s.lower()=="source"), list(h1)[0])
+s_quarters = next((s for s in h1 if s.lower() in ["quaters","quarters"]), list(h1)[-1])
+s_budget = next((s for s in h2 if s.lower()=="budget details".lower()), list(h2)[0])
+s_forecast = next((s for s in h2 if s.lower()=="forecast detail".lower()), list(h2)[-1])
+
+# resolve columns from the header row so only those the dashboard uses are parsed
+c_client = find_col(h1[s_source], ["Client", "Customer", "Account"])
+c_amount = find_col(h1[s_source], ["Amount", "Value", "Revenue"])
+c_cost = find_col(h1[s_source], ["Cost", "Costs", "Direct Cost"])
+c_period = find_col(h1[s_source], ["Fin Period", "Period", "Month", "Date"])
+
+f_client = find_col(h2[s_forecast], ["Client", "Customer"])
+f_period = find_col(h2[s_forecast], ["Period", "Month", "Fin Period", "Date"])
+f_value = find_col(h2[s_forecast], ["Forecast", "Amount", "Value", "Revenue"])
+
+df_source = read_xlsx(src1, source_key(src1), s_source, [c for c in (c_client, c_amount, c_cost, c_period) if c] or None)
+df_quarters = read_xlsx(src1, source_key(src1), s_quarters)
+df_budget = read_xlsx(src2, source_key(src2), s_budget)
+df_forecast = read_xlsx(src2, source_key(src2), s_forecast, [c for c in (f_client, f_period, f_value) if c] or None)
+
 def normalize_period(series):
-    s = series.astype(str).str.strip()
-    parsed = pd.to_datetime(s, errors="coerce", format="%Y-%m-%d")
-    m = parsed.notna()
-    out = pd.Series(index=series.index, dtype="datetime64[ns]")
-    out[m] = parsed[m]
-    if (~m).any():
-        out[~m] = pd.to_datetime(s[~m], errors="coerce", dayfirst=True, infer_datetime_format=True)
-    return out
+    # one pass: ISO strings parse as ISO, everything else is read day-first
+    s = series.astype("string[pyarrow]").str.strip()
+    return pd.to_datetime(s, errors="coerce", format="mixed", dayfirst=True)
+
+def period_array(df, col):
+    s = normalize_period(df[col]) if col else pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    return pa.array(s, type=pa.timestamp("ns"))
+
+def amount_array(df, col):
+    if col not in df:
+        return pa.nulls(len(df), pa.float64())
+    return pa.array(pd.to_numeric(df[col], errors="coerce"), type=pa.float64())
+
+def client_array(df, col):
+    if not col:
+        return pa.array(["(Unmapped)"] * len(df), pa.string())
+    return pa.array(df[col].astype("string[pyarrow]"))
+
+def with_columns(df, cols):
+    # append derived columns on the Arrow side instead of inserting them into a pandas copy one by one
+    tbl = pa.Table.from_pandas(df, preserve_index=False)
+    for name, arr in cols.items():
+        tbl = tbl.append_column(name, arr)
+    return tbl
+
+def arrow_to_pandas(tbl):
+    # dictionary columns become pandas categoricals; everything else stays Arrow-backed
+    return tbl.to_pandas(types_mapper=lambda t: None if pa.types.is_dictionary(t) else pd.ArrowDtype(t))
 
 # Build fact/forecast
-c_client = find_col(df_source, ["Client", "Customer", "Account"])
-c_amount = find_col(df_source, ["Amount", "Value", "Revenue"])
-c_cost = find_col(df_source, ["Cost", "Costs", "Direct Cost"])
-c_period = find_col(df_source, ["Fin Period", "Period", "Month", "Date"])
-
-fact = df_source.copy()
-fact["__Period"] = normalize_period(fact[c_period]) if c_period else pd.NaT
-fact["__Revenue"] = pd.to_numeric(fact[c_amount], errors="coerce") if c_amount in fact else np.nan
-fact["__Cost"] = pd.to_numeric(fact[c_cost], errors="coerce") if c_cost in fact else np.nan
-fact["__GP"] = fact["__Revenue"] - fact["__Cost"]
-fact["__Client"] = fact[c_client].astype(str) if c_client else "(Unmapped)"
-
-f_client = find_col(df_forecast, ["Client", "Customer"])
-f_period = find_col(df_forecast, ["Period", "Month", "Fin Period", "Date"])
-f_value = find_col(df_forecast, ["Forecast", "Amount", "Value", "Revenue"])
-
-forecast = df_forecast.copy()
-forecast["__Period"] = normalize_period(forecast[f_period]) if f_period else pd.NaT
-forecast["__Forecast"] = pd.to_numeric(forecast[f_value], errors="coerce") if f_value in forecast else np.nan
-forecast["__Client"] = forecast[f_client].astype(str) if f_client else "(Unmapped)"
+period = period_array(df_source, c_period)
+revenue = amount_array(df_source, c_amount)
+cost = amount_array(df_source, c_cost)
+fact_tbl = with_columns(df_source, {
+    "__Period": period,
+    "__Month": pc.floor_temporal(period, unit="month"),
+    "__Revenue": revenue,
+    "__Cost": cost,
+    "__GP": pc.subtract(revenue, cost),
+    "__Client": pc.dictionary_encode(client_array(df_source, c_client)),  # group on integer codes, not string hashes
+})
+fact = arrow_to_pandas(fact_tbl)
+
+period = period_array(df_forecast, f_period)
+forecast_tbl = with_columns(df_forecast, {
+    "__Period": period,
+    "__Month": pc.floor_temporal(period, unit="month"),
+    "__Forecast": amount_array(df_forecast, f_value),
+    "__Client": client_array(df_forecast, f_client),
+})
+forecast = arrow_to_pandas(forecast_tbl)
+data_key = (source_key(src1), source_key(src2))
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def client_options(_fact, data_key):
+    # categories of the dictionary-encoded __Client are exactly its distinct non-null values
+    return sorted(c for c in _fact["__Client"].cat.categories.tolist() if c)
 
 # Filters
 left, right = st.columns([3,1])
 with left:
     st.subheader("Filters")
-    uniq_clients = sorted([c for c in fact["__Client"].dropna().unique().tolist() if c])
+    uniq_clients = client_options(fact, data_key)
     default_clients = uniq_clients[:10] if len(uniq_clients) > 0 else []
     sel_clients = st.multiselect("Clients", options=uniq_clients, default=default_clients)
     date_min = pd.to_datetime(fact["__Period"].min())
@@ -156,16 +278,29 @@ with right:
     st.write("Source rows:", len(fact))
     st.write("Forecast rows:", len(forecast))
 
-mask = (fact["__Client"].isin(sel_clients) if sel_clients else True) &        (fact["__Period"].between(pd.to_datetime(sel_date[0]), pd.to_datetime(sel_date[1])))
-fmask = (forecast["__Client"].isin(sel_clients) if sel_clients else True) &         (forecast["__Period"].between(pd.to_datetime(sel_date[0]), pd.to_datetime(sel_date[1])))
-fact_f = fact[mask].copy()
-forecast_f = forecast[fmask].copy()
+def filter_mask(df, clients, lo, hi):
+    """Boolean row mask for the current filters, or None when every row is kept."""
+    period = df["__Period"].to_numpy()
+    # NaT propagates through min/max, so frames with unparsed periods still get masked
+    if not clients and len(period) and lo <= period.min() and period.max() <= hi:
+        return None
+    m = (period >= lo) & (period <= hi)
+    if clients:
+        m &= df["__Client"].isin(clients).to_numpy()
+    return m
+
+lo, hi = pd.to_datetime(sel_date[0]).to_datetime64(), pd.to_datetime(sel_date[1]).to_datetime64()
+sel_set = frozenset(sel_clients)  # built once, shared by both frames
+fact_m = filter_mask(fact, sel_set, lo, hi)
+forecast_m = filter_mask(forecast, sel_set, lo, hi)
+fact_f = fact if fact_m is None else fact[fact_m]
+forecast_f = forecast if forecast_m is None else forecast[forecast_m]
 
 # KPIs
 k1, k2, k3, k4 = st.columns(4)
-rev = fact_f["__Revenue"].sum(skipna=True)
-cost = fact_f["__Cost"].sum(skipna=True)
-gp = fact_f["__GP"].sum(skipna=True)
+# Arrow-backed columns reduce in Arrow's sum kernel; nulls are skipped and an empty selection sums to 0
+kpis = fact_f[["__Revenue", "__Cost", "__GP"]].sum(skipna=True)
+rev, cost, gp = kpis["__Revenue"], kpis["__Cost"], kpis["__GP"]
 margin = (gp / rev * 100) if pd.notna(rev) and rev != 0 else np.nan
 
 for col, title, val, fmt in [
@@ -184,47 +319,71 @@ for col, title, val, fmt in [
         st.markdown('</div>', unsafe_allow_html=True)
 
 # Charts
+def top_clients_by_revenue(df, n=15):
+    # __Client codes are dense 0..k-1, so bincount sums revenue per client in one pass with no sort or hashing
+    clients = df["__Client"].cat
+    codes = clients.codes.to_numpy()
+    revenue = df["__Revenue"].to_numpy(dtype="float64", na_value=0.0)
+    seen = codes >= 0
+    sums = np.bincount(codes[seen], weights=revenue[seen], minlength=len(clients.categories))
+    observed = np.flatnonzero(np.bincount(codes[seen], minlength=len(clients.categories)))
+    if len(observed) > n:
+        observed = observed[np.argpartition(-sums[observed], n - 1)[:n]]
+    top = observed[np.argsort(-sums[observed], kind="stable")]
+    return pd.DataFrame({"__Client": clients.categories[top], "__Revenue": sums[top]})
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def compute_views(_fact_f, _forecast_f, data_key, clients, date_range):
+    # the filtered frames are fully determined by (data_key, clients, date_range), so they are not hashed
+    ts = af = None
+    monthly = _fact_f.groupby("__Month")["__Revenue"].sum()
+    if _fact_f["__Period"].notna().any():
+        ts = monthly.rename_axis("Period").reset_index()
+    top_clients = top_clients_by_revenue(_fact_f)
+    if _forecast_f["__Period"].notna().any():
+        # both sides are indexed by month already, so align them with concat instead of a hash merge
+        fc = _forecast_f.groupby("__Month")["__Forecast"].sum()
+        af = (pd.concat([monthly.rename("Actual"), fc.rename("Forecast")], axis=1)
+              .sort_index().rename_axis("Period").reset_index())
+    return {"ts": ts, "top": top_clients, "af": af}
+
 st.divider()
 st.subheader("Trends & Top Clients")
 
-if fact_f["__Period"].notna().any():
-    ts = (fact_f.dropna(subset=["__Period"])
-          .assign(Period=lambda d: d["__Period"].dt.to_period("M").dt.to_timestamp())
-          .groupby("Period", as_index=False)["__Revenue"].sum())
+views = compute_views(fact_f, forecast_f, data_key, tuple(sorted(sel_set)), tuple(sel_date))
+ts, top_clients, af = views["ts"], views["top"], views["af"]
+
+if ts is not None:
     st.plotly_chart(px.line(ts, x="Period", y="__Revenue", title="Revenue trend"), use_container_width=True)
 
-top_clients = (fact_f.groupby("__Client", as_index=False)["__Revenue"].sum()
-               .sort_values("__Revenue", ascending=False).head(15))
 if len(top_clients) > 0:
     fig2 = px.bar(top_clients, x="__Client", y="__Revenue", title="Top clients by revenue")
     fig2.update_layout(xaxis_title="", yaxis_title="Revenue", xaxis_tickangle=-30)
     st.plotly_chart(fig2, use_container_width=True)
 
-if forecast_f["__Period"].notna().any():
-    act = (fact_f.dropna(subset=["__Period"])
-           .assign(Period=lambda d: d["__Period"].dt.to_period("M").dt.to_timestamp())
-           .groupby("Period", as_index=False)["__Revenue"].sum()
-           .rename(columns={"__Revenue": "Actual"}))
-    fc = (forecast_f.dropna(subset=["__Period"])
-           .assign(Period=lambda d: d["__Period"].dt.to_period("M").dt.to_timestamp())
-           .groupby("Period", as_index=False)["__Forecast"].sum()
-           .rename(columns={"__Forecast": "Forecast"}))
-    af = pd.merge(act, fc, on="Period", how="outer").sort_values("Period")
-    if len(af) > 0:
-        fig3 = px.bar(af.melt(id_vars="Period", value_vars=["Actual", "Forecast"],
-                              var_name="Type", value_name="Amount"),
-                      x="Period", y="Amount", color="Type",
-                      title="Actual vs Forecast (Monthly)")
-        st.plotly_chart(fig3, use_container_width=True)
+if af is not None and len(af) > 0:
+    fig3 = px.bar(af.melt(id_vars="Period", value_vars=["Actual", "Forecast"],
+                          var_name="Type", value_name="Amount"),
+                  x="Period", y="Amount", color="Type",
+                  title="Actual vs Forecast (Monthly)")
+    st.plotly_chart(fig3, use_container_width=True)
 
 st.divider()
 st.subheader("Data Explorer")
-tab1, tab2, tab3 = st.tabs(["Source fact", "Forecast detail", "Quarters map"])
-with tab1:
-    st.dataframe(fact_f.head(1000))
-with tab2:
-    st.dataframe(forecast_f.head(1000))
-with tab3:
+def head_rows(tbl, m, n=1000):
+    # pick the first n matching rows straight from the Arrow table; st.dataframe then skips its pandas -> Arrow pass
+    return tbl.slice(0, n) if m is None else tbl.take(np.flatnonzero(m)[:n])
+
+# st.tabs runs and serializes every tab on each rerun, so only the table the user picks is built and sent
+explorer = st.radio("Table", ["Source fact", "Forecast detail", "Quarters map"], index=None,
+                    horizontal=True, key="explorer_tab", label_visibility="collapsed")
+if explorer == "Source fact":
+    st.dataframe(head_rows(fact_tbl, fact_m))
+elif explorer == "Forecast detail":
+    st.dataframe(head_rows(forecast_tbl, forecast_m))
+elif explorer == "Quarters map":
     st.dataframe(df_quarters.head(1000))
+else:
+    st.caption("Pick a table to preview its first 1,000 rows.")
 
 st.caption("Set APP_PASSWORD in Streamlit > Settings > Secrets to restrict access.")